@@ -1,14 +1,20 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import json
 from datetime import datetime, timedelta
 import io
-import tempfile
 import os
+import time
+import tempfile
+import hashlib
+import contextlib
 
 # 页面配置
 st.set_page_config(
@@ -18,6 +24,55 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 船舶载重吨分类：各档下限（DWT）及对应类型，最后一项为缺失值
+DWT_BINS = np.array([40000, 65000, 100000, 200000], dtype=np.float64)
+DWT_TYPE_LABELS = ["Handysize", "Supramax/Ultramax", "Panamax/Kamsarmax", "Capesize", "VLOC", "Unknown"]
+
+# 季度和月份字段的固定类别
+QUARTER_LABELS = [f'Q{i}' for i in range(1, 5)]
+MONTH_LABELS = [f'M{i}' for i in range(1, 13)]
+
+# 仪表板实际使用的列，读取文件时只解析这些列（缺失的派生列会在加载后生成）
+REQUIRED_COLUMNS = [
+    'load_end_date', 'Year', 'Quarter', 'Month',
+    'voyage_type', 'vsl_dwt', 'vessel_dwt_type', 'voy_intake_mt',
+    'commodity', 'commodity_type_1level', 'commodity_type_2level', 'commodity_type_3level',
+    'load_zone', 'discharge_zone', 'load_country', 'discharge_country'
+]
+
+# 生成字段后保留的列：voyage_type筛选后恒为laden，不再随数据保留和缓存
+PROCESSED_COLUMNS = [col for col in REQUIRED_COLUMNS if col != 'voyage_type']
+
+# CSV流式解析时各列的类型：流式读取器只按首个数据块推断类型且之后不再修正，
+# 首块中全为空的列会被推断为null类型，后面出现实际值时整个读取失败，因此所有列都显式指定。
+# 日期按字符串读取，由check_and_generate_fields中的pd.to_datetime统一解析（兼容各种日期格式和时区）
+CSV_COLUMN_TYPES = {
+    col: pa.float64() if col in ('Year', 'vsl_dwt', 'voy_intake_mt') else pa.string()
+    for col in REQUIRED_COLUMNS
+}
+
+# 低基数的字符串列，加载后统一转为category类型
+CATEGORY_COLUMNS = [
+    'vessel_dwt_type', 'commodity_type_1level', 'commodity_type_2level', 'commodity_type_3level',
+    'load_zone', 'discharge_zone', 'load_country', 'discharge_country',
+    'voyage_type', 'commodity', 'Quarter', 'Month'
+]
+
+# 分析图表用到的列，筛选后只保留这些列，商品分类等只用于筛选的列不再随行复制
+ANALYSIS_COLUMNS = [
+    'load_end_date', 'Year', 'voy_intake_mt',
+    'load_zone', 'discharge_zone', 'load_country', 'discharge_country'
+]
+
+# 处理后数据的磁盘缓存目录（Arrow IPC文件，按数据指纹命名，服务重启后可直接内存映射读取）
+# 放在当前用户的私有缓存目录下，不与其他用户共用系统临时目录
+TABLE_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'axs_data_analysis', 'tables')
+# 磁盘缓存的上限：超过保留时间（与内存缓存的TTL一致）或总大小超限时，从最久未使用的文件开始删除
+TABLE_CACHE_MAX_AGE = 86400
+TABLE_CACHE_MAX_BYTES = 2 << 30
+# 处理逻辑改变（生成字段、类型等）时递增，旧版本的缓存文件不再被读取
+TABLE_CACHE_VERSION = 4
+
 class DataManager:
     """数据管理器 - 处理用户上传的数据"""
     
@@ -32,12 +87,46 @@ class DataManager:
         try:
             # 根据文件类型读取数据
             if uploaded_file.name.endswith('.csv'):
-                # 对于CSV文件，我们可以分块读取或直接读取
-                df = pd.read_csv(uploaded_file)
-            elif uploaded_file.name.endswith('.xlsx'):
-                df = pd.read_excel(uploaded_file)
+                # 使用PyArrow多线程CSV解析器直接从内存字节解析，不经过临时文件
+                # getbuffer() 返回上传内容的零拷贝视图，避免 getvalue() 额外复制一份字节
+                raw = uploaded_file.getbuffer()
+                read_options = pacsv.ReadOptions(use_threads=True, block_size=8 << 20)
+                
+                # 先读取表头，只解析仪表板用到且文件中存在的列
+                header = pacsv.open_csv(pa.BufferReader(raw), read_options=read_options).schema.names
+                columns = [col for col in header if col in REQUIRED_COLUMNS]
+                
+                # 流式逐块解析并立即筛选laden行，峰值内存只有筛选后的数据加一个数据块，
+                # 不再先把包含压载航次的整张表解析出来；列类型全部显式指定，不依赖首块的推断
+                reader = pacsv.open_csv(
+                    pa.BufferReader(raw),
+                    read_options=read_options,
+                    convert_options=pacsv.ConvertOptions(
+                        include_columns=columns,
+                        column_types={col: CSV_COLUMN_TYPES[col] for col in columns},
+                        # 与pandas一致：字符串列中的空值和NA等标记读为缺失值，而不是空字符串
+                        strings_can_be_null=True
+                    )
+                )
+                table = self.filter_laden_rows(reader, reader.schema)
+                df = table.to_pandas(split_blocks=True, self_destruct=True)
+                del table
+            elif uploaded_file.name.endswith(('.xlsx', '.xls')):
+                # calamine引擎（Rust实现）解析速度远快于openpyxl，同时支持xlsx和旧版xls
+                df = pd.read_excel(uploaded_file, engine='calamine', usecols=lambda col: col in REQUIRED_COLUMNS)
             elif uploaded_file.name.endswith('.parquet'):
-                df = pd.read_parquet(uploaded_file)
+                buffer = uploaded_file.getbuffer()
+                parquet_file = pq.ParquetFile(pa.BufferReader(buffer))
+                columns = [col for col in parquet_file.schema_arrow.names if col in REQUIRED_COLUMNS]
+                
+                # laden筛选下推到读取阶段：按行组统计信息跳过整组压载数据，被过滤的行不会转换为pandas
+                laden_filter = pc.field('voyage_type') == 'laden' if 'voyage_type' in columns else None
+                table = pq.read_table(pa.BufferReader(buffer), columns=columns, filters=laden_filter)
+                total_count = parquet_file.metadata.num_rows
+                if table.num_rows < total_count:
+                    st.info(f"已筛选voyage_type为laden的数据: {table.num_rows}/{total_count} 条记录")
+                df = table.to_pandas(split_blocks=True, self_destruct=True)
+                del table
             else:
                 st.error(f"不支持的文件格式: {uploaded_file.name}")
                 return None
@@ -49,6 +138,111 @@ class DataManager:
             st.error(f"数据加载失败: {str(e)}")
             return None
     
+    def filter_laden_rows(self, batches, schema):
+        """逐块筛选voyage_type为laden的行并合并为Arrow表，压载航次不进入后续处理"""
+        total_count = 0
+        laden_batches = []
+        for batch in batches:
+            total_count += batch.num_rows
+            if 'voyage_type' in schema.names:
+                batch = batch.filter(pc.equal(batch['voyage_type'], 'laden'))
+            laden_batches.append(batch)
+        
+        table = pa.Table.from_batches(laden_batches, schema=schema)
+        if table.num_rows < total_count:
+            st.info(f"已筛选voyage_type为laden的数据: {table.num_rows}/{total_count} 条记录")
+        return table
+    
+    def get_table_cache_path(self, data_id):
+        """获取处理后数据在磁盘缓存中的路径"""
+        return os.path.join(TABLE_CACHE_DIR, f"{data_id}.v{TABLE_CACHE_VERSION}.arrow")
+    
+    def load_cached_table(self, data_id):
+        """从磁盘缓存内存映射读取处理后的数据，不存在或读取失败时返回None"""
+        path = self.get_table_cache_path(data_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        
+        # 超过保留时间的文件视为未命中（清理只在写入时进行，读取时同样要检查）
+        if time.time() - mtime > TABLE_CACHE_MAX_AGE:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return None
+        
+        try:
+            # 内存映射读取，数值列直接引用映射页，无需把整个文件读入内存
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            df = table.to_pandas(split_blocks=True)
+        except Exception:
+            # 缓存文件损坏时删除，回退到重新处理（文件可能已被其他会话删除或仍被映射）
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return None
+        
+        # 更新修改时间，清理时按最近使用的先后保留
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return df
+    
+    def save_cached_table(self, df, data_id):
+        """将处理后的数据写入磁盘缓存（先写临时文件再原子替换，避免并发读到半个文件）"""
+        path = self.get_table_cache_path(data_id)
+        temp_path = None
+        try:
+            os.makedirs(TABLE_CACHE_DIR, mode=0o700, exist_ok=True)
+            # 各会话是同一进程中的不同线程，临时文件名必须唯一，不能只按进程号区分
+            fd, temp_path = tempfile.mkstemp(dir=TABLE_CACHE_DIR, prefix=f"{data_id}.", suffix='.tmp')
+            os.close(fd)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(temp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temp_path, path)
+        except Exception:
+            # 磁盘缓存只是加速手段，写入失败不影响本次分析
+            if temp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+        
+        self.prune_table_cache(keep=path)
+    
+    def prune_table_cache(self, keep=None):
+        """按保留时间和总大小上限清理磁盘缓存，keep指定的文件（刚写入的数据）不删除"""
+        try:
+            entries = []
+            with os.scandir(TABLE_CACHE_DIR) as it:
+                for entry in it:
+                    with contextlib.suppress(OSError):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        
+        # 从最久未使用的文件开始删除：先删超过保留时间的，再删到总大小不超过上限；
+        # 其他会话正在写入的临时文件只按保留时间清理
+        entries.sort()
+        expire_before = time.time() - TABLE_CACHE_MAX_AGE
+        total_size = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if path == keep:
+                continue
+            if mtime >= expire_before and (total_size <= TABLE_CACHE_MAX_BYTES or path.endswith('.tmp')):
+                continue
+            # 其他会话可能已删除该文件，Windows下仍被内存映射的文件也无法删除，均跳过
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                total_size -= size
+    
+    def clear_table_cache(self):
+        """删除磁盘缓存中的所有处理后数据"""
+        if not os.path.isdir(TABLE_CACHE_DIR):
+            return
+        for name in os.listdir(TABLE_CACHE_DIR):
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(TABLE_CACHE_DIR, name))
+    
     def load_default_commodity_hierarchy(self):
         """获取默认的商品分类结构"""
         return {
@@ -63,78 +257,101 @@ class DataManager:
             }
         }
     
-    def save_commodity_hierarchy_to_file(self, commodity_hierarchy):
-        """保存商品分类结构到临时文件"""
+    def serialize_commodity_hierarchy(self, commodity_hierarchy):
+        """将商品分类结构序列化为JSON字符串（直接在内存中生成，供下载使用）"""
         try:
-            # 创建临时文件
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
-                json.dump(commodity_hierarchy, f, indent=2, ensure_ascii=False)
-                temp_path = f.name
-            
-            # 提供下载
-            with open(temp_path, 'r', encoding='utf-8') as f:
-                json_content = f.read()
-            
-            # 清理临时文件
-            os.unlink(temp_path)
-            
-            return json_content
-            
+            return json.dumps(commodity_hierarchy, indent=2, ensure_ascii=False)
         except Exception as e:
             st.error(f"保存商品分类结构失败: {str(e)}")
             return None
+    
+    def export_data_to_parquet(self, df, chunk_rows=500_000):
+        """将处理后的数据导出为Parquet字节（重新上传时可跳过解析和字段生成）
+        
+        按行分块转换为Arrow并逐块写入行组，峰值内存只多出一个分块，而不是整张表的副本。
+        """
+        try:
+            buffer = io.BytesIO()
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            with pq.ParquetWriter(buffer, schema, compression='zstd') as writer:
+                for start in range(0, len(df), chunk_rows):
+                    chunk = df.iloc[start:start + chunk_rows]
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            return buffer.getvalue()
+            
+        except Exception as e:
+            st.error(f"导出Parquet失败: {str(e)}")
+            return None
+
+@st.cache_resource
+def get_data_manager():
+    """获取全局共享的数据管理器实例"""
+    return DataManager()
+
+@st.cache_resource
+def get_default_hierarchy_and_mapping(_data_manager):
+    """获取默认商品分类结构及其商品映射（全局共享，只读）"""
+    hierarchy = _data_manager.load_default_commodity_hierarchy()
+    return hierarchy, build_commodity_mapping(hierarchy)
 
 # 构建商品到层级的映射
+@st.cache_resource
 def build_commodity_mapping(hierarchy):
-    """构建商品到三个层级的映射字典"""
+    """构建商品到三个层级的映射字典（按引用缓存，调用方不得修改返回的字典）"""
     mapping = {}
     
-    def traverse(node, path):
+    # 用显式栈做深度优先遍历；子节点逆序入栈，保证映射顺序与层级结构一致
+    stack = [(hierarchy, ())]
+    while stack:
+        node, path = stack.pop()
         if isinstance(node, dict):
-            for key, value in node.items():
-                new_path = path + [key]
-                traverse(value, new_path)
+            for key, value in reversed(node.items()):
+                stack.append((value, path + (key,)))
         elif isinstance(node, list):
             # 当前路径至少有1个元素（level1），可能有2个（level2），可能有3个（level3）
+            level1 = path[0] if len(path) > 0 else "Unknown"
+            level2 = path[1] if len(path) > 1 else level1
+            level3 = path[2] if len(path) > 2 else level2
             for item in node:
-                level1 = path[0] if len(path) > 0 else "Unknown"
-                level2 = path[1] if len(path) > 1 else level1
-                level3 = path[2] if len(path) > 2 else level2
                 mapping[item] = (level1, level2, level3)
     
-    traverse(hierarchy, [])
     return mapping
 
+@st.cache_data
+def build_commodity_lower_index(commodity_mapping):
+    """构建小写商品名到层级的映射，以及按长度降序排列的小写商品名（用于部分匹配）"""
+    mapping_lower = {}
+    for key, value in commodity_mapping.items():
+        if isinstance(key, str):
+            # 小写后重名时保留先出现的项，与原始字典顺序一致
+            mapping_lower.setdefault(key.lower(), value)
+    
+    # 最长的商品名优先，匹配最具体的分类
+    lower_keys = sorted(mapping_lower, key=len, reverse=True)
+    return mapping_lower, lower_keys
+
 def check_and_generate_fields(df, commodity_mapping):
     """检查并生成缺失的字段"""
     modified = False
     
     # 1. 筛选voyage_type为laden的数据
+    # CSV/Parquet已在读取时按Arrow表筛选，这里主要处理Excel
     if 'voyage_type' in df.columns:
-        laden_count = len(df[df['voyage_type'] == 'laden'])
+        laden_mask = (df['voyage_type'] == 'laden').to_numpy()
+        laden_count = int(laden_mask.sum())
         total_count = len(df)
         if laden_count < total_count:
-            df = df[df['voyage_type'] == 'laden'].copy()
+            df = df[laden_mask].copy()
             modified = True
             st.info(f"已筛选voyage_type为laden的数据: {laden_count}/{total_count} 条记录")
     
     # 2. 生成vessel_dwt_type字段
     if 'vessel_dwt_type' not in df.columns and 'vsl_dwt' in df.columns:
-        def get_dwt_type(dwt):
-            if pd.isna(dwt):
-                return "Unknown"
-            if dwt >= 200000:
-                return "VLOC"
-            elif dwt >= 100000:
-                return "Capesize"
-            elif dwt >= 65000:
-                return "Panamax/Kamsarmax"
-            elif dwt >= 40000:
-                return "Supramax/Ultramax"
-            else:
-                return "Handysize"
-        
-        df['vessel_dwt_type'] = df['vsl_dwt'].apply(get_dwt_type)
+        # 向量化分箱：searchsorted(side='right') 与 ">= 下限" 的判断一致
+        dwt = pd.to_numeric(df['vsl_dwt'], errors='coerce').to_numpy(dtype=np.float64)
+        codes = np.searchsorted(DWT_BINS, dwt, side='right')
+        codes[np.isnan(dwt)] = len(DWT_TYPE_LABELS) - 1
+        df['vessel_dwt_type'] = pd.Categorical.from_codes(codes, categories=DWT_TYPE_LABELS)
         modified = True
         st.info("已生成vessel_dwt_type字段")
     
@@ -142,20 +359,30 @@ def check_and_generate_fields(df, commodity_mapping):
     date_fields_to_check = ['Year', 'Quarter', 'Month']
     missing_date_fields = [field for field in date_fields_to_check if field not in df.columns]
     
+    if 'load_end_date' in df.columns:
+        # 确保load_end_date是不带时区的datetime类型：带时区的日期（如以Z结尾的ISO字符串）统一换算为UTC，
+        # 后续的月序号分解、按日期排序和二分查找都要求datetime64数组
+        df['load_end_date'] = pd.to_datetime(df['load_end_date'], errors='coerce', utc=True).dt.tz_convert(None)
+    
     if missing_date_fields and 'load_end_date' in df.columns:
-        # 确保load_end_date是datetime类型
-        df['load_end_date'] = pd.to_datetime(df['load_end_date'], errors='coerce')
+        # 一次换算为自1970年1月起的月序号，年、季度、月都由它推出，不再分别遍历.dt属性
+        dates = df['load_end_date'].to_numpy()
+        missing = np.isnat(dates)
+        month_index = dates.astype('datetime64[M]').astype(np.int64)
+        month_codes = np.where(missing, -1, month_index % 12).astype('int8')
         
         if 'Year' not in df.columns:
-            df['Year'] = df['load_end_date'].dt.year
+            df['Year'] = pd.arrays.IntegerArray((month_index // 12 + 1970).astype('int16'), missing)
             modified = True
         
+        # 由整数编码直接构造固定类别，避免逐行拼接字符串；缺失日期对应编码-1（NaN）
         if 'Quarter' not in df.columns:
-            df['Quarter'] = 'Q' + df['load_end_date'].dt.quarter.astype(str)
+            quarter_codes = np.where(missing, -1, month_codes // 3).astype('int8')
+            df['Quarter'] = pd.Categorical.from_codes(quarter_codes, categories=QUARTER_LABELS)
             modified = True
         
         if 'Month' not in df.columns:
-            df['Month'] = 'M' + df['load_end_date'].dt.month.astype(str)
+            df['Month'] = pd.Categorical.from_codes(month_codes, categories=MONTH_LABELS)
             modified = True
         
         if modified:
@@ -166,344 +393,412 @@ def check_and_generate_fields(df, commodity_mapping):
     missing_commodity_fields = [field for field in commodity_fields_to_check if field not in df.columns]
     
     if missing_commodity_fields and 'commodity' in df.columns and commodity_mapping:
-        def get_commodity_levels(commodity):
-            if pd.isna(commodity):
-                return ("Unknown", "Unknown", "Unknown")
-            
-            # 尝试精确匹配
-            if commodity in commodity_mapping:
-                return commodity_mapping[commodity]
-            
-            # 尝试部分匹配
-            for key, value in commodity_mapping.items():
-                if isinstance(key, str) and key.lower() in commodity.lower():
-                    return value
-            
-            return ("Unknown", "Unknown", "Unknown")
+        # 商品名先转为category，映射只针对去重后的类别，再按整数编码展开到每一行
+        df['commodity'] = df['commodity'].astype('category')
+        names = df['commodity'].cat.categories
+        codes = df['commodity'].cat.codes.to_numpy()
         
-        # 应用分类函数
-        df[['commodity_type_1level', 'commodity_type_2level', 'commodity_type_3level']] = pd.DataFrame(
-            df['commodity'].apply(get_commodity_levels).tolist(),
-            index=df.index
+        # 精确匹配表：索引为商品名，列为三个层级
+        lookup = pd.DataFrame.from_dict(
+            commodity_mapping, orient='index', columns=commodity_fields_to_check
         )
+        
+        # 部分匹配只针对未精确匹配的商品名
+        mapping_lower, lower_keys = build_commodity_lower_index(commodity_mapping)
+        unmatched = names[~names.isin(lookup.index)]
+        partial = {}
+        for name in unmatched:
+            name_lower = str(name).lower()
+            
+            # 先尝试忽略大小写的精确匹配，再按商品名长度降序做子串匹配
+            value = mapping_lower.get(name_lower)
+            if value is None:
+                key = next((key for key in lower_keys if key in name_lower), None)
+                value = mapping_lower[key] if key is not None else None
+            if value is not None:
+                partial[name] = value
+        if partial:
+            lookup = pd.concat([
+                lookup,
+                pd.DataFrame.from_dict(partial, orient='index', columns=commodity_fields_to_check)
+            ])
+        
+        # 每个类别在映射表中的位置，未匹配指向末尾的Unknown；
+        # 末尾再追加一个Unknown槽位，缺失值的编码-1取到的正是它
+        positions = lookup.index.get_indexer(names)
+        positions[positions < 0] = len(lookup)
+        positions = np.append(positions, len(lookup))
+        for field in commodity_fields_to_check:
+            values = np.append(lookup[field].to_numpy(dtype=object), "Unknown")
+            df[field] = pd.Categorical(values[positions]).take(codes)
         modified = True
         st.info("已生成商品分类字段")
     
+    # 5. 只保留后续用到的列，之后的类型转换、排序和缓存都不再处理多余的列
+    kept_columns = [col for col in df.columns if col in PROCESSED_COLUMNS]
+    if len(kept_columns) < len(df.columns):
+        df = df[kept_columns]
+        modified = True
+    
     return df, modified
 
-@st.cache_data(ttl=86400)  # 缓存24小时
-def process_uploaded_data(uploaded_file, commodity_mapping):
-    """处理上传的数据"""
+def downcast_numeric_columns(df):
+    """数值列降精度：货运量和载重吨转float32，年份转int16
+    
+    单条记录的货运量/载重吨远小于float32可精确表示的整数上限（约1677万），
+    分组求和由PyArrow在float64中累加，汇总结果不损失精度。
+    """
+    for col in ['voy_intake_mt', 'vsl_dwt']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    
+    if 'Year' in df.columns:
+        year = pd.to_numeric(df['Year'], errors='coerce')
+        # 存在缺失日期时使用可空整数类型
+        df['Year'] = year.astype('int16' if year.notna().all() else 'Int16')
+    return df
+
+def convert_to_categorical(df):
+    """将低基数字符串列转换为category类型，减少内存并加速筛选和分组"""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def compute_upload_etag(uploaded_file, commodity_mapping):
+    """计算上传文件内容与商品映射的指纹，内容未变化时无需重新处理"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(uploaded_file.getbuffer())
+    hasher.update(repr(commodity_mapping).encode('utf-8'))
+    return hasher.hexdigest()
+
+@st.cache_resource(ttl=86400)  # 缓存24小时，按引用共享，不做序列化复制
+def process_uploaded_data(_uploaded_file, _commodity_mapping, data_id):
+    """处理上传的数据
+    
+    以data_id（上传内容与商品映射的指纹）为缓存键，不再对文件内容重复哈希。
+    处理结果同时写入磁盘缓存，服务重启或内存缓存失效后直接内存映射读取。
+    返回的DataFrame由所有会话共享，调用方必须将其视为只读，
+    需要新增列时使用assign等生成新DataFrame的方法。
+    """
     try:
         # 初始化数据管理器
-        data_manager = DataManager()
+        data_manager = get_data_manager()
+        
+        cached_df = data_manager.load_cached_table(data_id)
+        if cached_df is not None:
+            return cached_df
         
         # 加载数据
         with st.spinner("正在加载数据..."):
-            df = data_manager.load_data_from_upload(uploaded_file)
+            df = data_manager.load_data_from_upload(_uploaded_file)
         
         if df is None:
             return None
         
         # 检查并生成缺失字段
         with st.spinner("处理数据字段..."):
-            df, modified = check_and_generate_fields(df, commodity_mapping)
+            df, modified = check_and_generate_fields(df, _commodity_mapping)
+            df = convert_to_categorical(df)
+            df = downcast_numeric_columns(df)
+            
+            # 按日期排序，时间范围筛选可用二分查找直接切片
+            if 'load_end_date' in df.columns:
+                df = df.sort_values('load_end_date', kind='stable', na_position='last', ignore_index=True)
         
-        return df
+        # 写入磁盘缓存后内存映射读回：首次加载与之后的加载一样得到只读的共享数据，
+        # 数值列的原地修改会直接报错，处理过程中的临时副本也随之释放
+        data_manager.save_cached_table(df, data_id)
+        cached_df = data_manager.load_cached_table(data_id)
+        return cached_df if cached_df is not None else df
     
     except Exception as e:
         st.error(f"数据处理错误: {str(e)}")
         return None
 
-@st.cache_data(ttl=86400)  # 缓存24小时
-def get_filtered_data(df, filters):
-    """根据筛选条件获取数据（带缓存）"""
-    filtered_df = df.copy()
+def isin_mask(series, values):
+    """计算series中取值属于values的布尔掩码
+    
+    category列用类别查找表按整数编码直接索引（lut[codes]），不逐行比较字符串；
+    查找表末尾多留一个False位，编码-1（缺失值）正好落在该位置。
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.isin(values).to_numpy()
+    
+    categories = series.cat.categories
+    lut = np.zeros(len(categories) + 1, dtype=bool)
+    indexer = categories.get_indexer(list(values))
+    lut[indexer[indexer >= 0]] = True
+    return lut[series.cat.codes.to_numpy()]
+
+def get_filtered_data(df, filters, columns=None):
+    """根据筛选条件获取数据
+    
+    df需按load_end_date升序排列（process_uploaded_data保证，缺失日期排在最后），
+    时间范围用二分查找定位为连续切片，其余条件只在切片内计算掩码。
+    指定columns时只取出这些列（筛选条件用到的列不必包含在内），不复制其余列。
+    没有任何行被筛掉时直接返回原DataFrame（不复制），调用方需将结果视为只读。
+    """
+    if filters.get('date_range') and len(filters['date_range']) == 2 and 'load_end_date' in df.columns:
+        start_date, end_date = filters['date_range']
+        dates = df['load_end_date']
+        start = dates.searchsorted(pd.Timestamp(start_date), side='left')
+        stop = dates.searchsorted(pd.Timestamp(end_date), side='right')
+        if start > 0 or stop < len(df):
+            df = df.iloc[start:stop]
+    
+    # 其余条件合并为一个布尔掩码，最后只做一次索引，不复制整个DataFrame
+    mask = np.ones(len(df), dtype=bool)
     
     # 应用筛选条件
     if filters.get('vessel_type'):
-        filtered_df = filtered_df[filtered_df['vessel_dwt_type'].isin(filters['vessel_type'])]
+        mask &= isin_mask(df['vessel_dwt_type'], filters['vessel_type'])
     
     if filters.get('commodity_level1'):
-        filtered_df = filtered_df[filtered_df['commodity_type_1level'].isin(filters['commodity_level1'])]
+        mask &= isin_mask(df['commodity_type_1level'], filters['commodity_level1'])
     
     if filters.get('commodity_level2'):
-        filtered_df = filtered_df[filtered_df['commodity_type_2level'].isin(filters['commodity_level2'])]
+        mask &= isin_mask(df['commodity_type_2level'], filters['commodity_level2'])
     
     if filters.get('commodity_level3'):
-        filtered_df = filtered_df[filtered_df['commodity_type_3level'].isin(filters['commodity_level3'])]
+        mask &= isin_mask(df['commodity_type_3level'], filters['commodity_level3'])
     
-    if filters.get('date_range') and len(filters['date_range']) == 2 and 'load_end_date' in filtered_df.columns:
-        start_date, end_date = filters['date_range']
-        filtered_df = filtered_df[(filtered_df['load_end_date'] >= pd.Timestamp(start_date)) & 
-                                  (filtered_df['load_end_date'] <= pd.Timestamp(end_date))]
+    if filters.get('locations') and filters.get('location_type') in df.columns:
+        mask &= isin_mask(df[filters['location_type']], filters['locations'])
+    
+    if columns is not None:
+        columns = [col for col in columns if col in df.columns]
+        return df[columns] if mask.all() else df.loc[mask, columns]
+    
+    if mask.all():
+        return df
+    return df[mask]
+
+def get_session_filtered_data(df, data_id, filters, columns=None):
+    """在当前会话中复用上次的筛选结果：筛选条件未变的重跑（如切换图表选项）不再重新计算掩码"""
+    key = (
+        data_id,
+        tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in sorted(filters.items())),
+        tuple(columns) if columns is not None else None
+    )
+    cached = st.session_state.get('filtered_cache')
+    if cached is not None and cached[0] == key:
+        return cached[1]
     
+    filtered_df = get_filtered_data(df, filters, columns=columns)
+    st.session_state.filtered_cache = (key, filtered_df)
     return filtered_df
 
-def create_trade_flow_charts(df, vessel_type=None, commodity_level1=None, 
-                             commodity_level2=None, commodity_level3=None,
-                             analysis_type="overall"):
-    """创建贸易流柱状图"""
+def sum_intake_by(data, keys, sort=True):
+    """按keys汇总货运量（PyArrow多线程哈希聚合），剔除空键；sort=True时按keys排序
     
-    # 准备筛选条件
-    filters = {
-        'vessel_type': vessel_type,
-        'commodity_level1': commodity_level1,
-        'commodity_level2': commodity_level2,
-        'commodity_level3': commodity_level3
+    data可以是DataFrame，也可以是已转换好的Arrow表（多次汇总时共用一次转换）。
+    """
+    if isinstance(data, pa.Table):
+        table = data.select(keys + ['voy_intake_mt'])
+    else:
+        table = pa.Table.from_pandas(data[keys + ['voy_intake_mt']], preserve_index=False)
+    for key in keys:
+        table = table.filter(pc.is_valid(table[key]))
+    
+    # min_count=0 使全为空值的分组求和为0，与pandas一致
+    result = table.group_by(keys).aggregate(
+        [('voy_intake_mt', 'sum', pc.ScalarAggregateOptions(min_count=0))]
+    )
+    result = result.rename_columns(keys + ['voy_intake_mt']).to_pandas()
+    
+    # 聚合结果很小，直接在pandas中排序（Arrow不支持对字典编码列排序）
+    if sort:
+        result = result.sort_values(keys, ignore_index=True)
+    return result
+
+def aggregate_top10_by_year(data, column, years):
+    """一次分组汇总各年份货运量，返回 {年份: 前10名DataFrame}"""
+    # 排名只依赖nlargest的部分排序，汇总结果和按年份拆分都无需整体排序
+    agg = sum_intake_by(data, ['Year', column], sort=False)
+    top10 = {
+        year: year_agg.nlargest(10, 'voy_intake_mt')[[column, 'voy_intake_mt']].reset_index(drop=True)
+        for year, year_agg in agg.groupby('Year', observed=True, sort=False)
     }
+    empty = pd.DataFrame({column: pd.Series(dtype=object), 'voy_intake_mt': pd.Series(dtype=float)})
+    return {year: top10.get(year, empty) for year in years}
+
+def create_yearly_ranking_figure(years, top10, panels, title=None, yaxis_title=None):
+    """将各年份的前10排名合并为一个子图网格（每年一行，每个维度一列），只需一次序列化和渲染
     
-    # 使用缓存的筛选函数
-    filtered_df = get_filtered_data(df, filters)
+    yaxis_title 不为空时设置为每个子图的纵轴标题（单维度的装货/卸货分析使用）。
+    """
+    row_height = 500
     
-    if filtered_df.empty:
-        st.warning("筛选条件没有匹配的数据")
-        return
+    fig = make_subplots(
+        rows=len(years), cols=len(panels),
+        subplot_titles=[f'{year}年 {label}前10' for year in years for _, label, _ in panels],
+        horizontal_spacing=0.2,
+        vertical_spacing=80 / (row_height * len(years))
+    )
     
+    # 先构建全部柱状图，再一次性加入子图（逐个add_trace会反复校验整个图形）
+    traces, rows, cols = [], [], []
+    for row, year in enumerate(years, start=1):
+        for col, (column, label, color) in enumerate(panels, start=1):
+            year_top10 = top10[column][year]
+            traces.append(go.Bar(
+                x=year_top10['voy_intake_mt'].to_numpy(),
+                y=year_top10[column].to_numpy(),
+                orientation='h',
+                name=label,
+                marker_color=color
+            ))
+            rows.append(row)
+            cols.append(col)
+    fig.add_traces(traces, rows=rows, cols=cols)
+    fig.update_xaxes(title_text="货运量 (MT)")
+    if yaxis_title:
+        fig.update_yaxes(title_text=yaxis_title)
+    
+    fig.update_layout(
+        height=row_height * len(years),
+        showlegend=False,
+        title_text=title,
+        title_x=0.5
+    )
+    return fig
+
+@st.cache_data(ttl=3600)  # 缓存1小时
+def aggregate_trade_flow(_filtered_df, data_id, filters, columns):
+    """汇总各维度的年度前10名（以数据集标识和筛选条件为缓存键，只缓存小的结果表）
+    
+    _filtered_df 是已按 filters 筛选好的数据，filters 只用作缓存键。
+    """
     # 获取年份范围
-    years = sorted(filtered_df['Year'].dropna().unique())
+    years = sorted(_filtered_df['Year'].dropna().unique())
+    
+    # 各维度共用一次Arrow转换，每个维度的哈希聚合由PyArrow多线程执行
+    table = pa.Table.from_pandas(_filtered_df[['Year', *columns, 'voy_intake_mt']], preserve_index=False)
+    top10 = {column: aggregate_top10_by_year(table, column, years) for column in columns}
+    return years, top10
+
+@st.cache_data(ttl=3600)  # 缓存1小时
+def create_trade_flow_figure(_filtered_df, data_id, filters, columns, panels, title=None, yaxis_title=None):
+    """生成贸易流排名图（缓存键与aggregate_trade_flow相同，另加面板配置；重跑时不再重建子图网格）"""
+    years, top10 = aggregate_trade_flow(_filtered_df, data_id, filters, columns)
+    return create_yearly_ranking_figure(years, top10, panels, title=title, yaxis_title=yaxis_title)
+
+def create_trade_flow_charts(filtered_df, data_id, filters, analysis_type="overall"):
+    """创建贸易流柱状图（filtered_df 已按船舶类型和商品分类筛选，filters 为对应的筛选条件）"""
+    
+    # 各分析类型需要汇总的维度
+    columns = {
+        'overall': ('load_zone', 'discharge_zone', 'load_country', 'discharge_country'),
+        'loading': ('discharge_zone',),
+        'discharging': ('load_zone',)
+    }[analysis_type]
+    
+    # 使用缓存的汇总函数，重复的筛选组合直接命中缓存
+    years, _ = aggregate_trade_flow(filtered_df, data_id, filters, columns)
+    
+    if not years:
+        st.warning("筛选条件没有匹配的数据")
+        return
     
     if analysis_type == "overall":
-        # 总体分析 - 每年生成2张图（load_zone和discharge_zone，load_country和discharge_country）
+        # 总体分析 - 每年一行，左右分别为装货和卸货（load_zone和discharge_zone，load_country和discharge_country）
         
         # 1. 按区域分析
         st.subheader("按区域分析 - 年度排名前10")
         
-        for year in years:
-            year_df = filtered_df[filtered_df['Year'] == year]
-            
-            if not year_df.empty:
-                # 装货区域排名
-                load_zone_agg = year_df.groupby('load_zone')['voy_intake_mt'].sum().reset_index()
-                load_zone_agg = load_zone_agg.sort_values('voy_intake_mt', ascending=False).head(10)
-                
-                # 卸货区域排名
-                discharge_zone_agg = year_df.groupby('discharge_zone')['voy_intake_mt'].sum().reset_index()
-                discharge_zone_agg = discharge_zone_agg.sort_values('voy_intake_mt', ascending=False).head(10)
-                
-                # 创建子图
-                fig = make_subplots(
-                    rows=1, cols=2,
-                    subplot_titles=(f'{year}年 装货区域前10', f'{year}年 卸货区域前10'),
-                    horizontal_spacing=0.2
-                )
-                
-                # 装货区域柱状图
-                fig.add_trace(
-                    go.Bar(
-                        x=load_zone_agg['voy_intake_mt'],
-                        y=load_zone_agg['load_zone'],
-                        orientation='h',
-                        name='装货区域',
-                        marker_color='steelblue'
-                    ),
-                    row=1, col=1
-                )
-                
-                # 卸货区域柱状图
-                fig.add_trace(
-                    go.Bar(
-                        x=discharge_zone_agg['voy_intake_mt'],
-                        y=discharge_zone_agg['discharge_zone'],
-                        orientation='h',
-                        name='卸货区域',
-                        marker_color='darkorange'
-                    ),
-                    row=1, col=2
-                )
-                
-                fig.update_layout(
-                    height=500,
-                    showlegend=False,
-                    title_text=f"{year}年 区域贸易流分析",
-                    title_x=0.5
-                )
-                
-                fig.update_xaxes(title_text="货运量 (MT)", row=1, col=1)
-                fig.update_xaxes(title_text="货运量 (MT)", row=1, col=2)
-                
-                st.plotly_chart(fig, use_container_width=True)
+        fig = create_trade_flow_figure(
+            filtered_df, data_id, filters, columns,
+            [('load_zone', '装货区域', 'steelblue'), ('discharge_zone', '卸货区域', 'darkorange')],
+            title="区域贸易流分析"
+        )
+        st.plotly_chart(fig, use_container_width=True)
         
         # 2. 按国家分析
         st.subheader("按国家分析 - 年度排名前10")
         
-        for year in years:
-            year_df = filtered_df[filtered_df['Year'] == year]
-            
-            if not year_df.empty:
-                # 装货国家排名
-                load_country_agg = year_df.groupby('load_country')['voy_intake_mt'].sum().reset_index()
-                load_country_agg = load_country_agg.sort_values('voy_intake_mt', ascending=False).head(10)
-                
-                # 卸货国家排名
-                discharge_country_agg = year_df.groupby('discharge_country')['voy_intake_mt'].sum().reset_index()
-                discharge_country_agg = discharge_country_agg.sort_values('voy_intake_mt', ascending=False).head(10)
-                
-                # 创建子图
-                fig = make_subplots(
-                    rows=1, cols=2,
-                    subplot_titles=(f'{year}年 装货国家前10', f'{year}年 卸货国家前10'),
-                    horizontal_spacing=0.2
-                )
-                
-                # 装货国家柱状图
-                fig.add_trace(
-                    go.Bar(
-                        x=load_country_agg['voy_intake_mt'],
-                        y=load_country_agg['load_country'],
-                        orientation='h',
-                        name='装货国家',
-                        marker_color='seagreen'
-                    ),
-                    row=1, col=1
-                )
-                
-                # 卸货国家柱状图
-                fig.add_trace(
-                    go.Bar(
-                        x=discharge_country_agg['voy_intake_mt'],
-                        y=discharge_country_agg['discharge_country'],
-                        orientation='h',
-                        name='卸货国家',
-                        marker_color='mediumpurple'
-                    ),
-                    row=1, col=2
-                )
-                
-                fig.update_layout(
-                    height=500,
-                    showlegend=False,
-                    title_text=f"{year}年 国家贸易流分析",
-                    title_x=0.5
-                )
-                
-                fig.update_xaxes(title_text="货运量 (MT)", row=1, col=1)
-                fig.update_xaxes(title_text="货运量 (MT)", row=1, col=2)
-                
-                st.plotly_chart(fig, use_container_width=True)
+        fig = create_trade_flow_figure(
+            filtered_df, data_id, filters, columns,
+            [('load_country', '装货国家', 'seagreen'), ('discharge_country', '卸货国家', 'mediumpurple')],
+            title="国家贸易流分析"
+        )
+        st.plotly_chart(fig, use_container_width=True)
     
     elif analysis_type == "loading":
-        # 装货分析
+        # 装货分析 - 按卸货区域排名
         
         st.subheader("装货分析 - 年度排名前10")
         
-        for year in years:
-            year_df = filtered_df[filtered_df['Year'] == year]
-            
-            if not year_df.empty:
-                # 按卸货区域排名
-                discharge_zone_agg = year_df.groupby('discharge_zone')['voy_intake_mt'].sum().reset_index()
-                discharge_zone_agg = discharge_zone_agg.sort_values('voy_intake_mt', ascending=False).head(10)
-                
-                # 创建柱状图
-                fig = go.Figure()
-                
-                fig.add_trace(go.Bar(
-                    x=discharge_zone_agg['voy_intake_mt'],
-                    y=discharge_zone_agg['discharge_zone'],
-                    orientation='h',
-                    marker_color='coral'
-                ))
-                
-                fig.update_layout(
-                    title=f"{year}年 卸货区域排名前10",
-                    xaxis_title="货运量 (MT)",
-                    yaxis_title="卸货区域",
-                    height=500
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
+        fig = create_trade_flow_figure(
+            filtered_df, data_id, filters, columns,
+            [('discharge_zone', '卸货区域', 'coral')],
+            yaxis_title="卸货区域"
+        )
+        st.plotly_chart(fig, use_container_width=True)
     
     elif analysis_type == "discharging":
-        # 卸货分析
+        # 卸货分析 - 按装货区域排名
         
         st.subheader("卸货分析 - 年度排名前10")
         
-        for year in years:
-            year_df = filtered_df[filtered_df['Year'] == year]
-            
-            if not year_df.empty:
-                # 按装货区域排名
-                load_zone_agg = year_df.groupby('load_zone')['voy_intake_mt'].sum().reset_index()
-                load_zone_agg = load_zone_agg.sort_values('voy_intake_mt', ascending=False).head(10)
-                
-                # 创建柱状图
-                fig = go.Figure()
-                
-                fig.add_trace(go.Bar(
-                    x=load_zone_agg['voy_intake_mt'],
-                    y=load_zone_agg['load_zone'],
-                    orientation='h',
-                    marker_color='goldenrod'
-                ))
-                
-                fig.update_layout(
-                    title=f"{year}年 装货区域排名前10",
-                    xaxis_title="货运量 (MT)",
-                    yaxis_title="装货区域",
-                    height=500
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
+        fig = create_trade_flow_figure(
+            filtered_df, data_id, filters, columns,
+            [('load_zone', '装货区域', 'goldenrod')],
+            yaxis_title="装货区域"
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
 @st.cache_data(ttl=3600)  # 缓存1小时
-def create_time_series_charts(df, vessel_type=None, commodity_level1=None, 
-                              commodity_level2=None, commodity_level3=None,
-                              location_type="load_zone", selected_locations=None,
-                              date_range=None):
-    """创建时间序列图"""
+def create_time_series_charts(_df, data_id, base_filters, location_type="load_zone", selected_locations=None, date_range=None):
+    """创建时间序列图
     
-    # 准备筛选条件
+    _df 是已按 base_filters 筛选好的数据，不参与哈希；缓存键为数据集标识和各项筛选条件。
+    """
+    
+    # 船舶类型和商品分类已在调用前筛选，这里只叠加位置和时间条件
     filters = {
-        'vessel_type': vessel_type,
-        'commodity_level1': commodity_level1,
-        'commodity_level2': commodity_level2,
-        'commodity_level3': commodity_level3,
+        'location_type': location_type,
+        'locations': selected_locations,
         'date_range': date_range
     }
-    
-    # 使用缓存的筛选函数
-    filtered_df = get_filtered_data(df, filters)
-    
-    # 按位置筛选
-    if selected_locations and location_type in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df[location_type].isin(selected_locations)]
+    filtered_df = get_filtered_data(_df, filters)
     
     if filtered_df.empty:
         st.warning("筛选条件没有匹配的数据")
         return None
     
-    # 按时间聚合（月度）
-    filtered_df['Month_Year'] = filtered_df['load_end_date'].dt.to_period('M').astype(str)
+    # 按时间聚合（月度）：以月初日期为分组键，汇总后再把少量结果格式化为"YYYY-MM"标签
+    filtered_df = filtered_df.assign(Month_Year=filtered_df['load_end_date'].to_numpy().astype('datetime64[M]'))
     
-    # 分组聚合
+    # 分组聚合（选择多个位置时点数较多，使用WebGL渲染折线）
     if location_type in filtered_df.columns and selected_locations:
         # 如果选择了特定位置，按位置分组
-        time_series = filtered_df.groupby([location_type, 'Month_Year'])['voy_intake_mt'].sum().reset_index()
-        
-        fig = go.Figure()
+        time_series = sum_intake_by(filtered_df, [location_type, 'Month_Year'])
+        time_series['Month_Year'] = time_series['Month_Year'].dt.strftime('%Y-%m')
         
+        traces = []
         for location in selected_locations:
             location_data = time_series[time_series[location_type] == location]
-            fig.add_trace(go.Scatter(
-                x=location_data['Month_Year'],
-                y=location_data['voy_intake_mt'],
+            traces.append(go.Scattergl(
+                x=location_data['Month_Year'].to_numpy(),
+                y=location_data['voy_intake_mt'].to_numpy(),
                 mode='lines+markers',
                 name=location,
                 line=dict(width=2)
             ))
+        fig = go.Figure(data=traces)
     else:
         # 如果没有选择特定位置，显示总量
-        time_series = filtered_df.groupby('Month_Year')['voy_intake_mt'].sum().reset_index()
+        time_series = sum_intake_by(filtered_df, ['Month_Year'])
+        time_series['Month_Year'] = time_series['Month_Year'].dt.strftime('%Y-%m')
         
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=time_series['Month_Year'],
-            y=time_series['voy_intake_mt'],
+        fig = go.Figure(data=[go.Scattergl(
+            x=time_series['Month_Year'].to_numpy(),
+            y=time_series['voy_intake_mt'].to_numpy(),
             mode='lines+markers',
             name='总货运量',
             line=dict(width=3, color='royalblue')
-        ))
+        )])
     
     fig.update_layout(
         title=f"{location_type.replace('_', ' ').title()} 货运量时间变化",
@@ -516,62 +811,55 @@ def create_time_series_charts(df, vessel_type=None, commodity_level1=None,
     return fig
 
 @st.cache_data(ttl=3600)  # 缓存1小时
-def create_seasonal_charts(df, vessel_type=None, commodity_level1=None, 
-                           commodity_level2=None, commodity_level3=None,
-                           location_type=None, selected_locations=None,
-                           date_range=None):
-    """创建季节性规律图表"""
+def create_seasonal_charts(_df, data_id, base_filters, location_type=None, selected_locations=None, date_range=None):
+    """创建季节性规律图表
+    
+    _df 是已按 base_filters 筛选好的数据，不参与哈希；缓存键为数据集标识和各项筛选条件。
+    """
     
-    # 准备筛选条件
+    # 船舶类型和商品分类已在调用前筛选，这里只叠加位置和时间条件
     filters = {
-        'vessel_type': vessel_type,
-        'commodity_level1': commodity_level1,
-        'commodity_level2': commodity_level2,
-        'commodity_level3': commodity_level3,
+        'location_type': location_type,
+        'locations': selected_locations,
         'date_range': date_range
     }
-    
-    # 使用缓存的筛选函数
-    filtered_df = get_filtered_data(df, filters)
+    filtered_df = get_filtered_data(_df, filters)
     
     if filtered_df.empty:
         st.warning("筛选条件没有匹配的数据")
         return None
     
     # 提取月份
-    filtered_df['Month_Num'] = filtered_df['load_end_date'].dt.month
+    filtered_df = filtered_df.assign(Month_Num=filtered_df['load_end_date'].dt.month.astype('Int8'))
     
     if location_type and selected_locations and location_type in filtered_df.columns:
         # 如果选择了特定位置，按位置和月份分组
-        filtered_df = filtered_df[filtered_df[location_type].isin(selected_locations)]
-        
-        seasonal_data = filtered_df.groupby([location_type, 'Month_Num'])['voy_intake_mt'].sum().reset_index()
-        
-        fig = go.Figure()
+        seasonal_data = sum_intake_by(filtered_df, [location_type, 'Month_Num'])
         
+        traces = []
         for location in selected_locations:
             location_data = seasonal_data[seasonal_data[location_type] == location]
-            fig.add_trace(go.Scatter(
-                x=location_data['Month_Num'],
-                y=location_data['voy_intake_mt'],
+            traces.append(go.Scatter(
+                x=location_data['Month_Num'].to_numpy(),
+                y=location_data['voy_intake_mt'].to_numpy(),
                 mode='lines+markers',
                 name=location,
                 line=dict(width=2)
             ))
+        fig = go.Figure(data=traces)
         
         title = f"{location_type.replace('_', ' ').title()} 季节性规律"
     else:
         # 总体季节性规律
-        seasonal_data = filtered_df.groupby('Month_Num')['voy_intake_mt'].sum().reset_index()
+        seasonal_data = sum_intake_by(filtered_df, ['Month_Num'])
         
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=seasonal_data['Month_Num'],
-            y=seasonal_data['voy_intake_mt'],
+        fig = go.Figure(data=[go.Scatter(
+            x=seasonal_data['Month_Num'].to_numpy(),
+            y=seasonal_data['voy_intake_mt'].to_numpy(),
             mode='lines+markers',
             name='总货运量',
             line=dict(width=3, color='darkgreen')
-        ))
+        )])
         
         title = "货运量季节性规律"
     
@@ -593,6 +881,57 @@ def create_seasonal_charts(df, vessel_type=None, commodity_level1=None,
     
     return fig
 
+@st.cache_data(show_spinner=False)
+def get_filter_options(_df, data_id):
+    """计算侧边栏的筛选选项（按数据集标识缓存，重跑时不再扫描整个DataFrame）"""
+    columns = [
+        'vessel_dwt_type', 'commodity_type_1level',
+        'load_zone', 'discharge_zone', 'load_country', 'discharge_country'
+    ]
+    options = {col: sorted_options(_df[col]) for col in columns}
+    
+    if 'load_end_date' in _df.columns:
+        options['date_bounds'] = (_df['load_end_date'].min(), _df['load_end_date'].max())
+    
+    # 商品分类联动索引：上级分类 -> 下级分类列表，侧边栏联动时只需合并所选上级的子类
+    options['level2_by_level1'] = build_children_index(_df, 'commodity_type_1level', 'commodity_type_2level')
+    options['level3_by_level2'] = build_children_index(_df, 'commodity_type_2level', 'commodity_type_3level')
+    return options
+
+def sorted_options(series):
+    """返回列中出现过的取值（升序，忽略缺失值）
+    
+    category列按整数编码计数筛出实际出现的类别，类别本身已排序时直接沿用其顺序，
+    不再对整列去重后排序。
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return sorted(series.dropna().unique().tolist())
+    
+    codes = series.cat.codes.to_numpy()
+    categories = series.cat.categories
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    observed = categories[counts > 0]
+    # 固定顺序的类别（如载重吨分档）或来自Parquet字典的类别不一定有序
+    return observed.tolist() if observed.is_monotonic_increasing else sorted(observed.tolist())
+
+def build_children_index(df, parent_col, child_col):
+    """构建上级分类到下级分类列表的映射（忽略缺失值）"""
+    pairs = df[[parent_col, child_col]].dropna().drop_duplicates()
+    children = {}
+    for parent, child in zip(pairs[parent_col].tolist(), pairs[child_col].tolist()):
+        children.setdefault(parent, []).append(child)
+    return children
+
+def clear_data_caches():
+    """只清除与上传数据相关的缓存，商品分类结构和映射的缓存保持不变"""
+    process_uploaded_data.clear()
+    get_data_manager().clear_table_cache()
+    get_filter_options.clear()
+    aggregate_trade_flow.clear()
+    create_trade_flow_figure.clear()
+    create_time_series_charts.clear()
+    create_seasonal_charts.clear()
+
 def edit_commodity_hierarchy(commodity_hierarchy):
     """编辑商品分类层级结构"""
     st.header("📝 编辑商品分类层级结构")
@@ -608,8 +947,8 @@ def edit_commodity_hierarchy(commodity_hierarchy):
     
     with col1:
         # 提供JSON文件下载
-        data_manager = DataManager()
-        json_content = data_manager.save_commodity_hierarchy_to_file(commodity_hierarchy)
+        data_manager = get_data_manager()
+        json_content = data_manager.serialize_commodity_hierarchy(commodity_hierarchy)
         if json_content:
             st.download_button(
                 label="📥 下载当前结构",
@@ -620,10 +959,9 @@ def edit_commodity_hierarchy(commodity_hierarchy):
     
     with col2:
         if st.button("🔄 重置为默认结构"):
-            data_manager = DataManager()
-            default_hierarchy = data_manager.load_default_commodity_hierarchy()
+            default_hierarchy, default_mapping = get_default_hierarchy_and_mapping(get_data_manager())
             st.session_state.commodity_hierarchy = default_hierarchy
-            st.session_state.commodity_mapping = build_commodity_mapping(default_hierarchy)
+            st.session_state.commodity_mapping = default_mapping
             st.success("已重置为默认商品分类结构")
             st.rerun()
     
@@ -647,6 +985,131 @@ def edit_commodity_hierarchy(commodity_hierarchy):
     
     return None
 
+@st.fragment
+def render_trade_flow_tab(filtered_df, base_filters, locations):
+    """渲染贸易流分析标签页"""
+    st.header("贸易流分析")
+    
+    analysis_type = st.radio(
+        "选择分析类型",
+        ["总体分析", "装货分析", "卸货分析"],
+        horizontal=True
+    )
+    
+    if analysis_type == "总体分析":
+        create_trade_flow_charts(
+            filtered_df,
+            st.session_state.data_id,
+            base_filters,
+            analysis_type="overall"
+        )
+    else:
+        # 装货分析与卸货分析只有方向不同：按方向取对应的汇总维度和侧边栏选择
+        flow_type, prefix, label = {
+            "装货分析": ("loading", "load", "装货"),
+            "卸货分析": ("discharging", "discharge", "卸货")
+        }[analysis_type]
+        
+        st.subheader(f"选择{label}区域进行分析")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            use_zone = st.checkbox(f"按{label}区域分析", value=True)
+        
+        with col2:
+            use_country = st.checkbox(f"按{label}国家分析")
+        
+        # 同时勾选时以国家的选择为准
+        selected_for_analysis = locations[f'{prefix}_country'] if use_country else locations[f'{prefix}_zone']
+        
+        if (use_zone or use_country) and selected_for_analysis:
+            if use_zone:
+                create_trade_flow_charts(
+                    filtered_df,
+                    st.session_state.data_id,
+                    base_filters,
+                    analysis_type=flow_type
+                )
+            else:
+                st.info("按国家分析的实现与按区域分析类似")
+        else:
+            st.warning(f"请先选择{label}区域或国家")
+
+@st.fragment
+def render_time_series_tab(filtered_df, base_filters, locations, date_range):
+    """渲染时间序列分析标签页"""
+    st.header("海运量时间变化分析")
+    
+    analysis_type = st.radio(
+        "选择分析维度",
+        ["装货分析", "卸货分析"],
+        horizontal=True
+    )
+    
+    # 位置类型的选项随分析维度变化，所选类型直接对应侧边栏的位置选择
+    location_type = st.selectbox(
+        "选择位置类型",
+        {
+            "装货分析": ["load_zone", "load_country"],
+            "卸货分析": ["discharge_zone", "discharge_country"]
+        }[analysis_type]
+    )
+    
+    fig = create_time_series_charts(
+        filtered_df,
+        st.session_state.data_id,
+        base_filters,
+        location_type=location_type,
+        selected_locations=locations[location_type],
+        date_range=date_range
+    )
+    
+    if fig:
+        st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def render_seasonal_tab(filtered_df, base_filters, locations, date_range):
+    """渲染季节性分析标签页"""
+    st.header("季节性规律分析")
+    
+    analysis_type = st.selectbox(
+        "选择分析类型",
+        ["总体季节性", "按装货国家", "按卸货国家"]
+    )
+    
+    if analysis_type == "总体季节性":
+        fig = create_seasonal_charts(
+            filtered_df,
+            st.session_state.data_id,
+            base_filters,
+            date_range=date_range
+        )
+        
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+    
+    else:
+        location_type, label = {
+            "按装货国家": ("load_country", "装货"),
+            "按卸货国家": ("discharge_country", "卸货")
+        }[analysis_type]
+        
+        if locations[location_type]:
+            fig = create_seasonal_charts(
+                filtered_df,
+                st.session_state.data_id,
+                base_filters,
+                location_type=location_type,
+                selected_locations=locations[location_type],
+                date_range=date_range
+            )
+            
+            if fig:
+                st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.warning(f"请先在侧边栏选择{label}国家")
+
 def main():
     """主函数"""
     
@@ -671,10 +1134,9 @@ def main():
         
         # 初始化商品分类结构
         if 'commodity_hierarchy' not in st.session_state:
-            data_manager = DataManager()
-            default_hierarchy = data_manager.load_default_commodity_hierarchy()
+            default_hierarchy, default_mapping = get_default_hierarchy_and_mapping(get_data_manager())
             st.session_state.commodity_hierarchy = default_hierarchy
-            st.session_state.commodity_mapping = build_commodity_mapping(default_hierarchy)
+            st.session_state.commodity_mapping = default_mapping
         
         # 编辑功能
         edit_commodity_hierarchy(st.session_state.commodity_hierarchy)
@@ -708,18 +1170,26 @@ def main():
         with col2:
             if uploaded_file is not None:
                 if st.button("🚀 加载数据", type="primary", use_container_width=True):
-                    with st.spinner("正在处理数据..."):
-                        # 处理上传的数据
-                        df = process_uploaded_data(
-                            uploaded_file, 
-                            st.session_state.commodity_mapping if 'commodity_mapping' in st.session_state else None
-                        )
-                        
-                        if df is not None:
-                            st.session_state.current_data = df
-                            st.session_state.data_loaded = True
-                            st.success("数据加载成功！")
-                            st.rerun()
+                    commodity_mapping = st.session_state.commodity_mapping if 'commodity_mapping' in st.session_state else None
+                    etag = compute_upload_etag(uploaded_file, commodity_mapping)
+                    
+                    # 文件内容和商品映射都未变化时直接沿用已加载的数据
+                    if st.session_state.data_loaded and st.session_state.get('data_id') == etag:
+                        st.info("数据未变化，沿用已加载的数据")
+                    else:
+                        with st.spinner("正在处理数据..."):
+                            # 处理上传的数据
+                            df = process_uploaded_data(uploaded_file, commodity_mapping, etag)
+                            
+                            if df is not None:
+                                st.session_state.current_data = df
+                                st.session_state.data_loaded = True
+                                # 以内容指纹作为数据集标识，相同数据在各会话间共享汇总缓存
+                                st.session_state.data_id = etag
+                                st.session_state.parquet_export = None
+                                st.session_state.filtered_cache = None
+                                st.success("数据加载成功！")
+                                st.rerun()
         
         # 如果没有加载数据，显示提示
         if not st.session_state.data_loaded or st.session_state.current_data is None:
@@ -734,113 +1204,138 @@ def main():
             st.header("数据概览")
             st.write(f"总记录数: {len(df):,}")
             
+            # 筛选选项和时间范围按数据集缓存
+            filter_options = get_filter_options(df, st.session_state.data_id)
+            
             if 'load_end_date' in df.columns:
-                min_date = df['load_end_date'].min()
-                max_date = df['load_end_date'].max()
+                min_date, max_date = filter_options['date_bounds']
                 st.write(f"数据时间范围: {min_date.date()} 至 {max_date.date()}")
             
-            st.write(f"船舶类型数量: {df['vessel_dwt_type'].nunique()}")
-            st.write(f"商品一级分类: {df['commodity_type_1level'].nunique()}")
+            st.write(f"船舶类型数量: {len(filter_options['vessel_dwt_type'])}")
+            st.write(f"商品一级分类: {len(filter_options['commodity_type_1level'])}")
             
             st.markdown("---")
             st.header("筛选条件")
             
-            # 船舶类型选择
-            vessel_options = sorted(df['vessel_dwt_type'].dropna().unique().tolist())
-            selected_vessel_types = st.multiselect(
-                "选择船舶类型",
-                options=vessel_options,
-                default=None,
-                help="可多选"
-            )
-            
-            # 商品分类选择（联动）
-            st.subheader("商品分类筛选")
-            
-            commodity_level1_options = sorted(df['commodity_type_1level'].dropna().unique().tolist())
-            selected_level1 = st.multiselect(
-                "商品一级分类",
-                options=commodity_level1_options,
-                default=None
-            )
-            
-            if selected_level1:
-                level2_options = sorted(df[df['commodity_type_1level'].isin(selected_level1)]['commodity_type_2level'].dropna().unique().tolist())
-                selected_level2 = st.multiselect(
-                    "商品二级分类",
-                    options=level2_options,
+            # 筛选控件放在表单中，点击"应用筛选"后才触发一次重跑，逐个勾选时不会反复重算图表
+            # 商品二级、三级分类的选项随已应用的上级分类更新
+            with st.form("filters"):
+                # 船舶类型选择
+                selected_vessel_types = st.multiselect(
+                    "选择船舶类型",
+                    options=filter_options['vessel_dwt_type'],
+                    default=None,
+                    help="可多选"
+                )
+                
+                # 商品分类选择（联动）
+                st.subheader("商品分类筛选")
+                
+                selected_level1 = st.multiselect(
+                    "商品一级分类",
+                    options=filter_options['commodity_type_1level'],
                     default=None
                 )
-            else:
-                selected_level2 = None
-            
-            if selected_level2:
-                level3_options = sorted(df[df['commodity_type_2level'].isin(selected_level2)]['commodity_type_3level'].dropna().unique().tolist())
-                selected_level3 = st.multiselect(
-                    "商品三级分类",
-                    options=level3_options,
+                
+                if selected_level1:
+                    # 由缓存的联动索引合并所选一级分类的子类，不再扫描DataFrame
+                    level2_by_level1 = filter_options['level2_by_level1']
+                    level2_options = sorted({child for parent in selected_level1 for child in level2_by_level1.get(parent, [])})
+                    selected_level2 = st.multiselect(
+                        "商品二级分类",
+                        options=level2_options,
+                        default=None
+                    )
+                else:
+                    selected_level2 = None
+                
+                if selected_level2:
+                    level3_by_level2 = filter_options['level3_by_level2']
+                    level3_options = sorted({child for parent in selected_level2 for child in level3_by_level2.get(parent, [])})
+                    selected_level3 = st.multiselect(
+                        "商品三级分类",
+                        options=level3_options,
+                        default=None
+                    )
+                else:
+                    selected_level3 = None
+                
+                # 区域选择
+                st.subheader("区域选择")
+                
+                selected_load_zones = st.multiselect(
+                    "装货区域",
+                    options=filter_options['load_zone'],
                     default=None
                 )
-            else:
-                selected_level3 = None
-            
-            # 区域选择
-            st.subheader("区域选择")
-            
-            load_zone_options = sorted(df['load_zone'].dropna().unique().tolist())
-            discharge_zone_options = sorted(df['discharge_zone'].dropna().unique().tolist())
-            load_country_options = sorted(df['load_country'].dropna().unique().tolist())
-            discharge_country_options = sorted(df['discharge_country'].dropna().unique().tolist())
-            
-            selected_load_zones = st.multiselect(
-                "装货区域",
-                options=load_zone_options,
-                default=None
-            )
-            
-            selected_discharge_zones = st.multiselect(
-                "卸货区域",
-                options=discharge_zone_options,
-                default=None
-            )
-            
-            selected_load_countries = st.multiselect(
-                "装货国家",
-                options=load_country_options,
-                default=None
-            )
-            
-            selected_discharge_countries = st.multiselect(
-                "卸货国家",
-                options=discharge_country_options,
-                default=None
-            )
-            
-            # 时间范围选择
-            st.subheader("时间范围")
-            
-            if 'load_end_date' in df.columns:
-                min_date = df['load_end_date'].min()
-                max_date = df['load_end_date'].max()
                 
-                date_range = st.date_input(
-                    "选择时间范围",
-                    value=[min_date, max_date],
-                    min_value=min_date,
-                    max_value=max_date
+                selected_discharge_zones = st.multiselect(
+                    "卸货区域",
+                    options=filter_options['discharge_zone'],
+                    default=None
                 )
-            else:
-                date_range = None
+                
+                selected_load_countries = st.multiselect(
+                    "装货国家",
+                    options=filter_options['load_country'],
+                    default=None
+                )
+                
+                selected_discharge_countries = st.multiselect(
+                    "卸货国家",
+                    options=filter_options['discharge_country'],
+                    default=None
+                )
+                
+                # 时间范围选择
+                st.subheader("时间范围")
+                
+                if 'load_end_date' in df.columns:
+                    # 复用缓存的时间范围，不再重复扫描日期列
+                    date_range = st.date_input(
+                        "选择时间范围",
+                        value=[min_date, max_date],
+                        min_value=min_date,
+                        max_value=max_date
+                    )
+                else:
+                    date_range = None
+                
+                st.form_submit_button("✅ 应用筛选", type="primary", use_container_width=True)
             
             st.markdown("---")
             
+            # 导出处理后的数据，下次上传Parquet即可跳过CSV解析
+            if st.button("📦 导出为Parquet"):
+                data_manager = get_data_manager()
+                st.session_state.parquet_export = data_manager.export_data_to_parquet(df)
+            
+            if st.session_state.get('parquet_export'):
+                st.download_button(
+                    label="📥 下载处理后数据",
+                    data=st.session_state.parquet_export,
+                    file_name="axs_data.parquet",
+                    mime="application/octet-stream"
+                )
+            
             # 手动刷新缓存按钮
             if st.button("🔄 清除缓存并重新加载"):
-                st.cache_data.clear()
+                clear_data_caches()
                 st.session_state.data_loaded = False
                 st.session_state.current_data = None
+                st.session_state.parquet_export = None
+                st.session_state.filtered_cache = None
                 st.rerun()
         
+        # 船舶类型和商品分类筛选每次重跑最多执行一次，三个分析标签页共享筛选结果
+        base_filters = {
+            'vessel_type': selected_vessel_types,
+            'commodity_level1': selected_level1,
+            'commodity_level2': selected_level2,
+            'commodity_level3': selected_level3
+        }
+        filtered_df = get_session_filtered_data(df, st.session_state.data_id, base_filters, columns=ANALYSIS_COLUMNS)
+        
         # 创建分析标签页
         analysis_tab1, analysis_tab2, analysis_tab3 = st.tabs([
             "📊 贸易流分析", 
@@ -848,205 +1343,23 @@ def main():
             "🌊 季节性分析"
         ])
         
+        # 各标签页是独立的片段：切换标签页内的分析选项只重跑该标签页，
+        # 侧边栏和其余标签页的图表不再重新生成和发送
+        locations = {
+            'load_zone': selected_load_zones,
+            'load_country': selected_load_countries,
+            'discharge_zone': selected_discharge_zones,
+            'discharge_country': selected_discharge_countries
+        }
+        
         with analysis_tab1:
-            st.header("贸易流分析")
-            
-            analysis_type = st.radio(
-                "选择分析类型",
-                ["总体分析", "装货分析", "卸货分析"],
-                horizontal=True
-            )
-            
-            if analysis_type == "总体分析":
-                create_trade_flow_charts(
-                    df,
-                    vessel_type=selected_vessel_types,
-                    commodity_level1=selected_level1,
-                    commodity_level2=selected_level2,
-                    commodity_level3=selected_level3,
-                    analysis_type="overall"
-                )
-            elif analysis_type == "装货分析":
-                # 选择装货区域
-                st.subheader("选择装货区域进行分析")
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    use_load_zone = st.checkbox("按装货区域分析", value=True)
-                    if use_load_zone:
-                        selected_for_analysis = selected_load_zones
-                        location_type = "load_zone"
-                
-                with col2:
-                    use_load_country = st.checkbox("按装货国家分析")
-                    if use_load_country:
-                        selected_for_analysis = selected_load_countries
-                        location_type = "load_country"
-                
-                if (use_load_zone or use_load_country) and selected_for_analysis:
-                    if use_load_zone:
-                        create_trade_flow_charts(
-                            df,
-                            vessel_type=selected_vessel_types,
-                            commodity_level1=selected_level1,
-                            commodity_level2=selected_level2,
-                            commodity_level3=selected_level3,
-                            analysis_type="loading"
-                        )
-                    else:
-                        st.info("按国家分析的实现与按区域分析类似")
-                else:
-                    st.warning("请先选择装货区域或国家")
-            
-            elif analysis_type == "卸货分析":
-                # 选择卸货区域
-                st.subheader("选择卸货区域进行分析")
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    use_discharge_zone = st.checkbox("按卸货区域分析", value=True)
-                    if use_discharge_zone:
-                        selected_for_analysis = selected_discharge_zones
-                        location_type = "discharge_zone"
-                
-                with col2:
-                    use_discharge_country = st.checkbox("按卸货国家分析")
-                    if use_discharge_country:
-                        selected_for_analysis = selected_discharge_countries
-                        location_type = "discharge_country"
-                
-                if (use_discharge_zone or use_discharge_country) and selected_for_analysis:
-                    if use_discharge_zone:
-                        create_trade_flow_charts(
-                            df,
-                            vessel_type=selected_vessel_types,
-                            commodity_level1=selected_level1,
-                            commodity_level2=selected_level2,
-                            commodity_level3=selected_level3,
-                            analysis_type="discharging"
-                        )
-                    else:
-                        st.info("按国家分析的实现与按区域分析类似")
-                else:
-                    st.warning("请先选择卸货区域或国家")
+            render_trade_flow_tab(filtered_df, base_filters, locations)
         
         with analysis_tab2:
-            st.header("海运量时间变化分析")
-            
-            analysis_type = st.radio(
-                "选择分析维度",
-                ["装货分析", "卸货分析"],
-                horizontal=True
-            )
-            
-            if analysis_type == "装货分析":
-                location_type = st.selectbox(
-                    "选择位置类型",
-                    ["load_zone", "load_country"]
-                )
-                
-                if location_type == "load_zone":
-                    selected_locations = selected_load_zones
-                else:
-                    selected_locations = selected_load_countries
-                
-                fig = create_time_series_charts(
-                    df,
-                    vessel_type=selected_vessel_types,
-                    commodity_level1=selected_level1,
-                    commodity_level2=selected_level2,
-                    commodity_level3=selected_level3,
-                    location_type=location_type,
-                    selected_locations=selected_locations,
-                    date_range=date_range
-                )
-                
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True)
-            
-            else:  # 卸货分析
-                location_type = st.selectbox(
-                    "选择位置类型",
-                    ["discharge_zone", "discharge_country"]
-                )
-                
-                if location_type == "discharge_zone":
-                    selected_locations = selected_discharge_zones
-                else:
-                    selected_locations = selected_discharge_countries
-                
-                fig = create_time_series_charts(
-                    df,
-                    vessel_type=selected_vessel_types,
-                    commodity_level1=selected_level1,
-                    commodity_level2=selected_level2,
-                    commodity_level3=selected_level3,
-                    location_type=location_type,
-                    selected_locations=selected_locations,
-                    date_range=date_range
-                )
-                
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True)
+            render_time_series_tab(filtered_df, base_filters, locations, date_range)
         
         with analysis_tab3:
-            st.header("季节性规律分析")
-            
-            analysis_type = st.selectbox(
-                "选择分析类型",
-                ["总体季节性", "按装货国家", "按卸货国家"]
-            )
-            
-            if analysis_type == "总体季节性":
-                fig = create_seasonal_charts(
-                    df,
-                    vessel_type=selected_vessel_types,
-                    commodity_level1=selected_level1,
-                    commodity_level2=selected_level2,
-                    commodity_level3=selected_level3,
-                    date_range=date_range
-                )
-                
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True)
-            
-            elif analysis_type == "按装货国家":
-                if selected_load_countries:
-                    fig = create_seasonal_charts(
-                        df,
-                        vessel_type=selected_vessel_types,
-                        commodity_level1=selected_level1,
-                        commodity_level2=selected_level2,
-                        commodity_level3=selected_level3,
-                        location_type="load_country",
-                        selected_locations=selected_load_countries,
-                        date_range=date_range
-                    )
-                    
-                    if fig:
-                        st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.warning("请先在侧边栏选择装货国家")
-            
-            else:  # 按卸货国家
-                if selected_discharge_countries:
-                    fig = create_seasonal_charts(
-                        df,
-                        vessel_type=selected_vessel_types,
-                        commodity_level1=selected_level1,
-                        commodity_level2=selected_level2,
-                        commodity_level3=selected_level3,
-                        location_type="discharge_country",
-                        selected_locations=selected_discharge_countries,
-                        date_range=date_range
-                    )
-                    
-                    if fig:
-                        st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.warning("请先在侧边栏选择卸货国家")
+            render_seasonal_tab(filtered_df, base_filters, locations, date_range)
 
 if __name__ == "__main__":
     main()